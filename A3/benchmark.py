@@ -0,0 +1,68 @@
+import os
+import sys
+import argparse
+
+from common.benchmark import (CLASSIFIERS, append_results, baseline_run, compare, load_results,
+                              machine, run_benchmark)
+from common.kernel_svm import SVM_BACKENDS
+
+TRAIN_PATH = os.path.join("data", "train.tsv")
+TEST_PATH = os.path.join("data", "test.tsv")
+# Synthetic (replicated) datasets, reused across runs
+DATA_PATH = os.path.join("cache", "benchmark")
+RESULTS_PATH = os.path.join("benchmarks", "results.jsonl")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Throughput / latency benchmark of the hate speech classifiers')
+    parser.add_argument('--scales', default='10k,100k',
+                        help='Comma separated number of train tweets, eg. 10k,100k,1M,10M')
+    parser.add_argument('--classifiers', default='rf,fasttext,nb',
+                        help='Comma separated subset of {}'.format(','.join(CLASSIFIERS)))
+    parser.add_argument('--test-ratio', type=float, default=0.3,
+                        help='Number of test tweets as a fraction of the train tweets')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Cores used for preprocessing and the forest')
+    parser.add_argument('--rf-max-depth', type=int, help='Maximum depth of the Random Forest trees')
+    parser.add_argument('--svm-backend', choices=SVM_BACKENDS, default='exact')
+    parser.add_argument('--ft-quantize', action='store_true', help='Quantize the fastText model')
+    parser.add_argument('--data-dir', default=DATA_PATH, help='Directory of the synthetic datasets')
+    parser.add_argument('--results', default=RESULTS_PATH, help='json lines file the results are appended to')
+    parser.add_argument('--baseline', default='previous',
+                        help="Run id to compare against, 'previous' for the last run on this machine or 'none'")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Slowdown / memory growth ratio reported as a regression')
+    args = parser.parse_args()
+
+    args.scales = [scale for scale in args.scales.split(',') if scale]
+    args.classifiers = [name for name in args.classifiers.split(',') if name]
+    unknown = [name for name in args.classifiers if name not in CLASSIFIERS]
+    if unknown:
+        parser.error('unknown classifiers: {}'.format(', '.join(unknown)))
+
+    records = run_benchmark(args, TRAIN_PATH, TEST_PATH)
+    if not records:
+        sys.exit(0)
+
+    previous = load_results(args.results)
+    append_results(args.results, records)
+    print('Results of run {} appended to {}'.format(records[0]["run_id"], args.results))
+
+    if args.baseline == 'none':
+        sys.exit(0)
+    baseline = baseline_run(previous, args.baseline, records[0])
+    if not baseline:
+        print('No baseline run to compare against')
+        sys.exit(0)
+    if machine(baseline[0]) != machine(records[0]):
+        print('Warning: run {} was measured on {} ({} cpus), not compared'.format(
+            baseline[0]["run_id"], *machine(baseline[0])))
+        sys.exit(0)
+
+    regressions = compare(records, baseline, args.threshold)
+    print('Compared against run {} ({} stages regressed)'.format(baseline[0]["run_id"], len(regressions)))
+    for item in regressions:
+        print('{scale:>9} {classifier:<10} {stage:<10} {baseline_seconds:.3f}s -> {seconds:.3f}s '
+              '(x{time_ratio}), {baseline_peak_mb} MB -> {peak_mb} MB (x{memory_ratio})'.format(**item))
+    # Non zero exit status, so that regressions fail automated runs
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,3 @@
+"""
+    Components shared by the task1 and task2 hate speech classifiers
+"""
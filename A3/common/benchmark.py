@@ -0,0 +1,372 @@
+import gc
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+from .loader import CHUNK_SIZE, normalize_chunks, read_chunks
+
+SCALE_SUFFIXES = {"k": 10 ** 3, "m": 10 ** 6}
+# Stages faster than this (in seconds) are too noisy to be flagged as regressions
+MIN_COMPARED_SECONDS = 0.05
+MEGABYTE = 2 ** 20
+# Runs are only compared against runs measured on the same machine
+MACHINE_FIELDS = ("host", "cpus")
+
+
+def parse_scale(scale):
+    """
+        Number of tweets for a scale such as '10k', '2.5M' or '5000'
+    """
+    scale = scale.strip().lower()
+    if scale[-1] in SCALE_SUFFIXES:
+        return int(float(scale[:-1]) * SCALE_SUFFIXES[scale[-1]])
+    return int(scale)
+
+
+def replicate(source_path, dest_path, n_rows):
+    """
+        Writes a synthetic .tsv file of 'n_rows' tweets by repeating the rows of 'source_path'
+        Every repetition prefixes the ids with its copy number, so the ids stay unique
+        An existing file of the requested size is reused
+    """
+    if os.path.exists(dest_path):
+        return dest_path
+
+    with open(source_path, "r", encoding="utf-8") as inFile:
+        header = inFile.readline()
+        rows = [row if row.endswith("\n") else row + "\n" for row in inFile if row.strip()]
+
+    directory = os.path.dirname(dest_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(dest_path + ".tmp", "w", encoding="utf-8") as outFile:
+        outFile.write(header)
+        written = 0
+        copy = 0
+        while written < n_rows:
+            batch = rows[:n_rows - written]
+            if copy == 0:
+                outFile.writelines(batch)
+            else:
+                outFile.writelines("{}-{}".format(copy, row) for row in batch)
+            written += len(batch)
+            copy += 1
+    os.replace(dest_path + ".tmp", dest_path)
+    return dest_path
+
+
+def current_rss():
+    """
+        Resident memory of this process in bytes
+        Falls back to the (process wide) peak where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def release_memory():
+    """
+        Collects garbage and, on glibc, returns the freed heap to the system, so that the
+        peak of the next stage is measured from what is actually still in use
+    """
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class MemorySampler:
+
+    """
+        Samples the resident memory of the process in a background thread
+        Unlike tracemalloc it also sees native allocations (fastText, spacy) and does
+        not slow down the measured code, but memory of worker processes is not included
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class StageRecorder:
+
+    """
+        Times the stages of a benchmark run and records their peak memory
+        Every record carries the run metadata, so results of different runs can be compared
+    """
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.records = []
+
+    @contextmanager
+    def stage(self, scale, classifier, stage, rows):
+        release_memory()
+        with MemorySampler() as memory:
+            start = time.perf_counter()
+            yield
+            seconds = time.perf_counter() - start
+
+        record = dict(self.metadata)
+        record.update({
+            "scale": scale,
+            "classifier": classifier,
+            "stage": stage,
+            "rows": rows,
+            "seconds": round(seconds, 6),
+            "rows_per_sec": round(rows / seconds, 2) if seconds > 0 else None,
+            "peak_mb": round((memory.peak - memory.start) / MEGABYTE, 2),
+            "rss_mb": round(memory.peak / MEGABYTE, 2)
+        })
+        self.records.append(record)
+        print('{:>9} {:<10} {:<10} {:>10.3f}s {:>12} rows/s {:>9.1f} MB'.format(
+            scale, classifier, stage, seconds, record["rows_per_sec"], record["peak_mb"]))
+
+
+def run_metadata():
+    """
+        Identifies the run : time, commit, machine and library versions
+    """
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    import sklearn
+    return {
+        "run_id": time.strftime("%Y%m%d-%H%M%S"),
+        "commit": commit,
+        "host": platform.node(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__
+    }
+
+
+def run_rf(stage, train, test, options):
+    """
+        Task 1 : Random Forest over tf-idf vectors
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.ensemble import RandomForestClassifier
+
+    with stage("vectorize", len(train) + len(test)):
+        vectorizer = TfidfVectorizer(min_df=5, max_df=0.8, dtype=np.float32)
+        vectors = vectorizer.fit_transform(np.concatenate([train["text"].to_numpy(), test["text"].to_numpy()]))
+        train_vectors = vectors[:len(train)].tocsc()
+        test_vectors = vectors[len(train):]
+    with stage("fit", len(train)):
+        clf = RandomForestClassifier(max_depth=options.rf_max_depth, n_jobs=options.n_jobs, random_state=0)
+        clf.fit(train_vectors, train["hateful"].to_numpy())
+    with stage("predict", len(test)):
+        clf.predict(test_vectors)
+
+
+def run_svm(stage, train, test, options):
+    """
+        Task 1 : SVM over Word2Vec (spacy) document vectors
+    """
+    from .kernel_svm import make_svm
+    from .persistence import SpacyVectorizer
+
+    with stage("embed", len(train) + len(test)):
+        vectorizer = SpacyVectorizer()
+        train_vectors = vectorizer.transform(train["text"].to_numpy())
+        test_vectors = vectorizer.transform(test["text"].to_numpy())
+    with stage("fit", len(train)):
+        clf = make_svm(options.svm_backend, random_state=0)
+        clf.fit(train_vectors, train["hateful"].to_numpy())
+    with stage("predict", len(test)):
+        clf.predict(test_vectors)
+
+
+def run_fasttext(stage, train, test, options):
+    """
+        Task 1 : supervised fastText (embeds the tweets while fitting)
+    """
+    from .fasttext_model import FastTextClassifier
+
+    with stage("fit", len(train)):
+        clf = FastTextClassifier(quantize=options.ft_quantize)
+        clf.fit(train["text"].to_numpy(), train["hateful"].to_numpy())
+    with stage("predict", len(test)):
+        clf.predict(test["text"].to_numpy())
+
+
+def run_nb(stage, train, test, options):
+    """
+        Task 2 : Multinomial Naive Bayes over the top 2000 term counts by mutual information
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.feature_selection import SelectKBest
+    from sklearn.naive_bayes import MultinomialNB
+    from .feature_selection import presence_mutual_info
+
+    with stage("vectorize", len(train) + len(test)):
+        vectorizer = CountVectorizer(min_df=5, max_df=0.9)
+        train_vectors = vectorizer.fit_transform(train["text"].to_numpy())
+        test_vectors = vectorizer.transform(test["text"].to_numpy())
+    with stage("select", len(train)):
+        topK = SelectKBest(presence_mutual_info, k=min(2000, train_vectors.shape[1]))
+        train_vectors = topK.fit_transform(train_vectors, train["hateful"].to_numpy())
+        test_vectors = topK.transform(test_vectors)
+    with stage("fit", len(train)):
+        clf = MultinomialNB()
+        clf.fit(train_vectors, train["hateful"].to_numpy())
+    with stage("predict", len(test)):
+        clf.predict(test_vectors)
+
+
+CLASSIFIERS = {
+    "rf": run_rf,
+    "svm": run_svm,
+    "fasttext": run_fasttext,
+    "nb": run_nb
+}
+
+
+def load_stages(recorder, scale, data_path, n_jobs):
+    """
+        Loads 'data_path' as the shared loader does, timing the parsing ('load') and the
+        normalization ('preprocess') of the chunks separately
+    """
+    name = "train" if "train" in os.path.basename(data_path) else "test"
+    with open(data_path, "rb") as inFile:
+        rows = sum(1 for _ in inFile) - 1
+
+    with recorder.stage(scale, name, "load", rows):
+        chunks = list(read_chunks(data_path, CHUNK_SIZE))
+    with recorder.stage(scale, name, "preprocess", rows):
+        dataset = normalize_chunks(chunks, data_path, n_jobs)
+    return dataset
+
+
+def run_benchmark(options, train_path, test_path):
+    """
+        Runs every classifier of 'options.classifiers' at every scale of 'options.scales'
+        Returns the records of all the measured stages
+    """
+    recorder = StageRecorder(run_metadata())
+    # Records are keyed by the number of tweets, so that eg. '10k' and '10000' runs are compared
+    for n_train in [parse_scale(scale) for scale in options.scales]:
+        n_test = max(1, int(n_train * options.test_ratio))
+        scaled_train = replicate(train_path, os.path.join(options.data_dir, "train_{}.tsv".format(n_train)), n_train)
+        scaled_test = replicate(test_path, os.path.join(options.data_dir, "test_{}.tsv".format(n_test)), n_test)
+
+        train = load_stages(recorder, n_train, scaled_train, options.n_jobs)
+        test = load_stages(recorder, n_train, scaled_test, options.n_jobs)
+
+        for name in options.classifiers:
+            try:
+                CLASSIFIERS[name](lambda stage, rows: recorder.stage(n_train, name, stage, rows), train, test, options)
+            except (ImportError, OSError) as error:
+                # eg. fasttext / spacy or the spacy language model are not installed
+                print('{:>9} {:<10} skipped: {}'.format(n_train, name, error))
+    return recorder.records
+
+
+def load_results(results_path):
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path, "r", encoding="utf-8") as inFile:
+        return [json.loads(line) for line in inFile if line.strip()]
+
+
+def append_results(results_path, records):
+    """
+        Appends the 'records' of a run to the json lines file 'results_path'
+    """
+    directory = os.path.dirname(results_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(results_path, "a", encoding="utf-8") as outFile:
+        for record in records:
+            outFile.write(json.dumps(record) + "\n")
+
+
+def machine(record):
+    """
+        (host, cpus) the record was measured on
+    """
+    return tuple(record.get(field) for field in MACHINE_FIELDS)
+
+
+def compare(records, baseline, threshold=1.2):
+    """
+        Compares the stages of a run against the same (scale, classifier, stage) of the 'baseline' run
+        Stages measured on another machine (host / cpus) are not compared
+        Returns the comparisons whose time or peak memory grew by more than 'threshold' times
+    """
+    previous = {(parse_scale(str(item["scale"])), item["classifier"], item["stage"]): item for item in baseline}
+    regressions = []
+    for record in records:
+        key = (parse_scale(str(record["scale"])), record["classifier"], record["stage"])
+        if key not in previous or machine(previous[key]) != machine(record):
+            continue
+        before = previous[key]
+        time_ratio = record["seconds"] / before["seconds"] if before["seconds"] > 0 else 1.0
+        memory_ratio = record["peak_mb"] / before["peak_mb"] if before["peak_mb"] > 1 else 1.0
+        slower = time_ratio > threshold and max(record["seconds"], before["seconds"]) >= MIN_COMPARED_SECONDS
+        if slower or memory_ratio > threshold:
+            regressions.append({
+                "scale": record["scale"],
+                "classifier": record["classifier"],
+                "stage": record["stage"],
+                "seconds": record["seconds"],
+                "baseline_seconds": before["seconds"],
+                "time_ratio": round(time_ratio, 3),
+                "peak_mb": record["peak_mb"],
+                "baseline_peak_mb": before["peak_mb"],
+                "memory_ratio": round(memory_ratio, 3)
+            })
+    return regressions
+
+
+def baseline_run(results, run_id, current):
+    """
+        Records of the baseline run : 'previous' is the latest run before the 'current'
+        record's run which was measured on the same machine
+    """
+    runs = []
+    for record in results:
+        if record["run_id"] != current["run_id"] and record["run_id"] not in runs and \
+                (run_id != "previous" or machine(record) == machine(current)):
+            runs.append(record["run_id"])
+    if run_id == "previous":
+        run_id = runs[-1] if runs else None
+    return [record for record in results if record["run_id"] == run_id]
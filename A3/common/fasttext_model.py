@@ -0,0 +1,128 @@
+import os
+import tempfile
+import numpy as np
+import fasttext
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+LABEL_PREFIX = "__label__"
+
+# fastText only trains from a (seekable) file, every thread reads its own part of it
+# Files are kept in shared memory when available so training never touches the disk
+MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+def _write_train_file(tweets, labels):
+    """
+        Writes the train file required by 'FastText' containing labels prefixed with __label__
+        Returns the path of the (in memory) temporary file
+    """
+    handle, file_path = tempfile.mkstemp(suffix=".txt", dir=MEMORY_DIR)
+    with os.fdopen(handle, "w", encoding="utf-8") as outFile:
+        # Lines are streamed to the file, the corpus is never joined into one string
+        outFile.writelines('{}{} {}\n'.format(LABEL_PREFIX, label, tweet)
+                           for tweet, label in zip(tweets, labels))
+    return file_path
+
+
+class FastTextClassifier(BaseEstimator, ClassifierMixin):
+
+    """
+        Supervised fastText classifier usable as the last step of a pipeline
+        thread            : number of training threads (all the cores by default)
+        autotune_duration : seconds spent by fastText autotune on a held out 'validation_fraction'
+                            of the tweets, 0 trains with the given epoch / lr / word_ngrams / dim
+        quantize          : compresses the trained model (product quantization, retrained),
+                            'cutoff' keeps only the most important words / ngrams
+        The trained model is pickled as the bytes of its binary file
+    """
+
+    def __init__(self, thread=None, autotune_duration=0, validation_fraction=0.1, quantize=False,
+                 cutoff=0, epoch=5, lr=0.1, word_ngrams=1, dim=100, random_state=0):
+        self.thread = thread
+        self.autotune_duration = autotune_duration
+        self.validation_fraction = validation_fraction
+        self.quantize = quantize
+        self.cutoff = cutoff
+        self.epoch = epoch
+        self.lr = lr
+        self.word_ngrams = word_ngrams
+        self.dim = dim
+        self.random_state = random_state
+
+    def fit(self, tweets, labels):
+        tweets = list(tweets)
+        labels = list(labels)
+        self.classes_ = np.unique(np.asarray(labels).astype(str))
+        params = {
+            "thread": self.thread or os.cpu_count() or 1,
+            "seed": self.random_state
+        }
+        if not self.autotune_duration:
+            # Hyperparameters which are set explicitly are left out of the autotune search
+            params.update({"epoch": self.epoch, "lr": self.lr, "wordNgrams": self.word_ngrams, "dim": self.dim})
+
+        temp_files = []
+        try:
+            if self.autotune_duration:
+                order = np.random.RandomState(self.random_state).permutation(len(tweets))
+                n_validation = max(1, int(len(tweets) * self.validation_fraction))
+                validation, train = order[:n_validation], order[n_validation:]
+                validation_file = _write_train_file([tweets[idx] for idx in validation],
+                                                    [labels[idx] for idx in validation])
+                temp_files.append(validation_file)
+                tweets = [tweets[idx] for idx in train]
+                labels = [labels[idx] for idx in train]
+                params["autotuneValidationFile"] = validation_file
+                params["autotuneDuration"] = self.autotune_duration
+
+            train_file = _write_train_file(tweets, labels)
+            temp_files.append(train_file)
+            self.model_ = fasttext.train_supervised(train_file, **params)
+
+            if self.quantize:
+                # Retraining needs the train file, so quantize before it is removed
+                self.model_.quantize(input=train_file, qnorm=True, retrain=True,
+                                     cutoff=self.cutoff, thread=params["thread"])
+        finally:
+            for file_path in temp_files:
+                os.remove(file_path)
+
+        return self
+
+    def predict(self, tweets):
+        """
+            Bulk prediction of all the 'tweets' in a single call to fastText
+            Returns a NumPy array of the labels, without the __label__ prefix
+        """
+        labels, _ = self.model_.predict(list(tweets), k=1)
+        return np.char.replace(np.asarray(labels, dtype=str).reshape(-1), LABEL_PREFIX, "")
+
+    def save_model(self, file_path):
+        """
+            Writes the fastText model ('.ftz' by convention when quantized, '.bin' otherwise)
+        """
+        self.model_.save_model(file_path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if "model_" in state:
+            handle, model_file = tempfile.mkstemp(suffix=".bin", dir=MEMORY_DIR)
+            os.close(handle)
+            try:
+                self.model_.save_model(model_file)
+                with open(model_file, "rb") as inFile:
+                    state["model_"] = inFile.read()
+            finally:
+                os.remove(model_file)
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state.get("model_"), bytes):
+            handle, model_file = tempfile.mkstemp(suffix=".bin", dir=MEMORY_DIR)
+            try:
+                with os.fdopen(handle, "wb") as outFile:
+                    outFile.write(state["model_"])
+                state["model_"] = fasttext.load_model(model_file)
+            finally:
+                os.remove(model_file)
+        self.__dict__.update(state)
@@ -0,0 +1,94 @@
+import numpy as np
+from sklearn.metrics import f1_score
+
+
+def oob_f1(forest, labels):
+    """
+        Out of bag macro f1 score of a forest fit with oob_score=True
+        Replaces the separate cross validation pass, every tree is scored on the rows left out of its bootstrap
+    """
+    decision = forest.oob_decision_function_
+    seen = ~np.isnan(decision).any(axis=1)
+    predicted = forest.classes_[decision[seen].argmax(axis=1)]
+    return f1_score(np.asarray(labels)[seen], predicted, average='macro')
+
+
+def _float32_thresholds(thresholds):
+    """
+        Largest float32 not above each (float64) threshold
+        For float32 inputs 'x <= threshold' then gives the same split as the original threshold
+    """
+    rounded = thresholds.astype(np.float32)
+    above = rounded > thresholds
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+class CompactForest:
+
+    """
+        Array based export of a fitted RandomForestClassifier, for storing / shipping the forest
+        The nodes of all the trees are stored in flat arrays (int32 features / children,
+        float32 thresholds / leaf class probabilities), which are much smaller than the
+        pickled forest, leaves point to themselves
+        Predictions are left to RandomForestClassifier, whose compiled traversal is faster
+    """
+
+    @classmethod
+    def from_forest(cls, forest):
+        compact = cls()
+        features, thresholds, left, right, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            leaf = tree.children_left == -1
+            nodes = np.arange(tree.node_count)
+
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold))
+            left.append(np.where(leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(leaf, nodes, tree.children_right) + offset)
+            value = tree.value[:, 0, :]
+            values.append(value / value.sum(axis=1, keepdims=True))
+            roots.append(offset)
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        compact.feature_ = np.concatenate(features).astype(np.int32)
+        compact.threshold_ = _float32_thresholds(np.concatenate(thresholds))
+        compact.left_ = np.concatenate(left).astype(np.int32)
+        compact.right_ = np.concatenate(right).astype(np.int32)
+        compact.value_ = np.concatenate(values).astype(np.float32)
+        compact.roots_ = np.array(roots, dtype=np.int32)
+        compact.max_depth_ = max_depth
+        compact.classes_ = forest.classes_
+        compact.n_features_ = forest.n_features_in_ if hasattr(forest, "n_features_in_") else forest.n_features_
+        return compact
+
+    def save(self, file_path):
+        """
+            Stores the compact forest as a compressed .npz archive
+        """
+        np.savez_compressed(file_path, feature=self.feature_, threshold=self.threshold_, left=self.left_,
+                            right=self.right_, value=self.value_, roots=self.roots_, classes=self.classes_,
+                            max_depth=self.max_depth_, n_features=self.n_features_)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+            Reads back the node arrays of a compact forest stored with 'save'
+        """
+        compact = cls()
+        with np.load(file_path, allow_pickle=False) as archive:
+            compact.feature_ = archive["feature"]
+            compact.threshold_ = archive["threshold"]
+            compact.left_ = archive["left"]
+            compact.right_ = archive["right"]
+            compact.value_ = archive["value"]
+            compact.roots_ = archive["roots"]
+            compact.classes_ = archive["classes"]
+            compact.max_depth_ = int(archive["max_depth"])
+            compact.n_features_ = int(archive["n_features"])
+        return compact
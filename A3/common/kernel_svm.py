@@ -0,0 +1,125 @@
+import csv
+import time
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.svm import SVC, LinearSVC
+
+SVM_BACKENDS = ["exact", "rff", "nystroem"]
+BENCHMARK_FIELDS = ["backend", "n_train", "n_test", "accuracy", "macro_f1", "fit_time", "predict_time"]
+
+
+def scale_gamma(X):
+    """
+        RBF kernel width used by SVC(gamma='scale') : 1 / (n_features * X.var())
+    """
+    X = np.asarray(X, dtype=np.float64)
+    variance = X.var()
+    return 1.0 / (X.shape[1] * variance) if variance != 0 else 1.0
+
+
+class ApproximateKernelSVM(BaseEstimator, ClassifierMixin):
+
+    """
+        RBF kernel SVM approximated by an explicit feature map followed by a linear solver
+        backend = 'rff'      : random Fourier features (RBFSampler)
+        backend = 'nystroem' : Nystroem low rank approximation of the kernel matrix
+        solver  = 'liblinear' fits a LinearSVC, 'sgd' fits a hinge loss SGDClassifier
+        Fit time is linear in the number of tweets and predict time only depends on
+        'n_components', unlike SVC which is quadratic / cubic to fit and predicts in
+        time linear in the number of support vectors
+    """
+
+    def __init__(self, backend="nystroem", n_components=1000, gamma="scale", C=1.0,
+                 solver="liblinear", random_state=0):
+        self.backend = backend
+        self.n_components = n_components
+        self.gamma = gamma
+        self.C = C
+        self.solver = solver
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        gamma = scale_gamma(X) if self.gamma == "scale" else self.gamma
+        if self.backend == "rff":
+            self.feature_map_ = RBFSampler(gamma=gamma, n_components=self.n_components,
+                                           random_state=self.random_state)
+        elif self.backend == "nystroem":
+            self.feature_map_ = Nystroem(kernel="rbf", gamma=gamma, n_components=self.n_components,
+                                         random_state=self.random_state)
+        else:
+            raise ValueError("Unknown kernel approximation '{}'".format(self.backend))
+
+        if self.solver == "liblinear":
+            # Primal formulation, as there are (many) more tweets than components
+            self.linear_ = LinearSVC(C=self.C, dual=False, random_state=self.random_state)
+        elif self.solver == "sgd":
+            self.linear_ = SGDClassifier(alpha=1.0 / (self.C * len(y)), random_state=self.random_state)
+        else:
+            raise ValueError("Unknown linear solver '{}'".format(self.solver))
+
+        features = self.feature_map_.fit_transform(np.asarray(X, dtype=np.float64))
+        self.linear_.fit(features, y)
+        self.classes_ = self.linear_.classes_
+        return self
+
+    def decision_function(self, X):
+        return self.linear_.decision_function(self.feature_map_.transform(np.asarray(X, dtype=np.float64)))
+
+    def predict(self, X):
+        return self.linear_.predict(self.feature_map_.transform(np.asarray(X, dtype=np.float64)))
+
+
+def make_svm(backend="exact", random_state=0, **params):
+    """
+        SVM classifier for 'backend' : the exact RBF SVC or one of its kernel approximations
+    """
+    if backend == "exact":
+        return SVC(random_state=random_state, **params)
+    return ApproximateKernelSVM(backend=backend, random_state=random_state, **params)
+
+
+def benchmark_svm_backends(vectors, labels, backends=SVM_BACKENDS, test_size=0.25, random_state=0):
+    """
+        Fits every SVM backend on the same stratified split of 'vectors'
+        Returns the accuracy, macro f1, fit and predict time (in seconds) of each backend
+    """
+    train_vectors, test_vectors, train_labels, test_labels = train_test_split(
+        np.asarray(vectors), np.asarray(labels), test_size=test_size,
+        stratify=labels, random_state=random_state)
+
+    results = []
+    for backend in backends:
+        clf = clone(make_svm(backend, random_state=random_state))
+
+        start = time.perf_counter()
+        clf.fit(train_vectors, train_labels)
+        fit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        predicted = clf.predict(test_vectors)
+        predict_time = time.perf_counter() - start
+
+        results.append({
+            "backend": backend,
+            "n_train": len(train_labels),
+            "n_test": len(test_labels),
+            "accuracy": round(accuracy_score(test_labels, predicted), 6),
+            "macro_f1": round(f1_score(test_labels, predicted, average='macro'), 6),
+            "fit_time": round(fit_time, 6),
+            "predict_time": round(predict_time, 6)
+        })
+    return results
+
+
+def write_benchmark(file_path, results):
+    """
+        Writes the SVM backend benchmark 'results' as a csv file
+    """
+    with open(file_path, "w", encoding="utf-8", newline="") as outFile:
+        writer = csv.DictWriter(outFile, fieldnames=BENCHMARK_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
@@ -0,0 +1,99 @@
+import os
+import csv
+import hashlib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from .text import normalize
+
+# Rows parsed (and normalized by one job) at a time
+CHUNK_SIZE = 100000
+# Files smaller than this are normalized in process, starting workers would cost more
+PARALLEL_MIN_BYTES = 32 * 2 ** 20
+# Bump whenever the parsing / normalization changes, so that stale cached datasets are ignored
+CACHE_VERSION = 1
+
+
+def file_checksum(file_path):
+    """
+        SHA-1 of the contents of 'file_path'
+    """
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as inFile:
+        for block in iter(lambda: inFile.read(2 ** 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_chunk(chunk):
+    """
+        Normalizes the tweets of a raw chunk and converts its labels (if any) to int8
+    """
+    chunk["text"] = normalize(chunk["text"])
+    if "hateful" in chunk:
+        chunk["hateful"] = chunk["hateful"].astype(np.int8)
+    return chunk
+
+
+def read_chunks(data_path, chunksize=CHUNK_SIZE):
+    """
+        Iterator over the raw (unnormalized) DataFrame chunks of the .tsv file 'data_path'
+    """
+    return pd.read_csv(data_path, sep="\t", quoting=csv.QUOTE_NONE, dtype=str, encoding="utf-8",
+                       keep_default_na=False, chunksize=chunksize)
+
+
+def normalize_chunks(chunks, data_path, n_jobs=-1):
+    """
+        Normalizes the raw 'chunks' read from 'data_path' and concatenates them into one DataFrame
+        The chunks of files over PARALLEL_MIN_BYTES are normalized in parallel over 'n_jobs' processes
+    """
+    if n_jobs == 1 or os.path.getsize(data_path) <= PARALLEL_MIN_BYTES:
+        parsed = [normalize_chunk(chunk) for chunk in chunks]
+    else:
+        parsed = Parallel(n_jobs=n_jobs)(delayed(normalize_chunk)(chunk) for chunk in chunks)
+    return pd.concat(parsed, ignore_index=True)
+
+
+def read_dataset(data_path, chunksize=CHUNK_SIZE, n_jobs=-1):
+    """
+        Reads the .tsv file pointed out by 'data_path' into a columnar DataFrame
+        (id, text and hateful if the file is labelled) in chunks of 'chunksize' rows
+    """
+    return normalize_chunks(read_chunks(data_path, chunksize), data_path, n_jobs)
+
+
+def load_dataset(data_path, cache_dir=None, chunksize=CHUNK_SIZE, n_jobs=-1):
+    """
+        Parsed and normalized dataset of 'data_path'
+        With a 'cache_dir' the dataset is stored as a parquet file keyed by the checksum of
+        the source file, and later loads of the same file read it back instead of re-parsing
+    """
+    if cache_dir is None:
+        return read_dataset(data_path, chunksize, n_jobs)
+
+    cache_file = os.path.join(cache_dir, "{}.{}.v{}.parquet".format(
+        os.path.basename(data_path), file_checksum(data_path)[:16], CACHE_VERSION))
+    if os.path.exists(cache_file):
+        return pd.read_parquet(cache_file)
+
+    dataset = read_dataset(data_path, chunksize, n_jobs)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    # Written under a temporary name first, so an interrupted run never leaves a partial cache
+    dataset.to_parquet(cache_file + ".tmp", index=False)
+    os.replace(cache_file + ".tmp", cache_file)
+    return dataset
+
+
+def load_data(data_path, label_type=str, cache_dir=None, n_jobs=-1):
+    """
+        Loads the .tsv file pointed out by 'data_path'
+        Returns the id, tweets and labels (if any) in the file as arrays
+    """
+    dataset = load_dataset(data_path, cache_dir, n_jobs=n_jobs)
+    ids = dataset["id"].to_numpy()
+    tweets = dataset["text"].to_numpy()
+    labels = dataset["hateful"].to_numpy().astype(label_type) if "hateful" in dataset else []
+    return ids, tweets, labels
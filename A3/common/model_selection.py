@@ -0,0 +1,321 @@
+import csv
+import math
+import functools
+import time
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+
+LEADERBOARD_FIELDS = [
+    "rank", "model", "params", "mean_f1", "std_f1", "fit_time",
+    "predict_time", "predict_ms_per_tweet", "timing", "n_resources", "within_budget"
+]
+
+
+def _params_key(params):
+    """
+        Hashable key for a parameter dictionary
+    """
+    return tuple(sorted((params or {}).items(), key=lambda item: item[0]))
+
+
+def format_params(params):
+    """
+        Readable form of a parameter dictionary, functions (and their partials) are shown by their name
+    """
+    return {key: getattr(value.func if isinstance(value, functools.partial) else value, "__name__", value)
+            for key, value in params.items()}
+
+
+def _take(data, indices):
+    """
+        Selects the rows 'indices' from a list, array or sparse matrix
+    """
+    if isinstance(data, list):
+        return [data[idx] for idx in indices]
+    return data[indices]
+
+
+class FoldCache:
+
+    """
+        Cross validation folds with their vectorized features
+        The vectorizer is fit once per fold (and per vectorizer setting) and the
+        resulting train / validation matrices are shared by every candidate
+        evaluated on that fold, instead of re-vectorizing per candidate
+        If 'vectorizer' is None the documents are taken as precomputed vectors (eg. embeddings)
+    """
+
+    def __init__(self, documents, labels, vectorizer=None, cv=3, random_state=0):
+        self.documents = documents
+        self.labels = np.asarray(labels)
+        self.vectorizer = vectorizer
+        splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+        self.folds = list(splitter.split(np.zeros(len(self.labels)), self.labels))
+        self._cache = {}
+
+    def vectorize(self, fold, vectorizer_params=None):
+        """
+            Returns (train_vectors, train_labels, val_vectors, val_labels) for 'fold'
+        """
+        key = (fold, _params_key(vectorizer_params))
+        if key not in self._cache:
+            self._cache[key] = self._vectorize(fold, vectorizer_params)
+        return self._cache[key]
+
+    def prefetch(self, vectorizer_grid, n_jobs=1):
+        """
+            Vectorizes every (fold, vectorizer setting) pair in parallel and caches the result
+        """
+        missing = [(fold, params) for params in vectorizer_grid for fold in range(len(self.folds))
+                   if (fold, _params_key(params)) not in self._cache]
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(self._vectorize)(fold, params) for fold, params in missing)
+        for (fold, params), result in zip(missing, results):
+            self._cache[(fold, _params_key(params))] = result
+
+    def _vectorize(self, fold, vectorizer_params):
+        train_idx, val_idx = self.folds[fold]
+        train_labels = self.labels[train_idx]
+        val_labels = self.labels[val_idx]
+
+        if self.vectorizer is None:
+            vectors = np.asarray(self.documents)
+            return vectors[train_idx], train_labels, vectors[val_idx], val_labels
+
+        vectorizer = clone(self.vectorizer).set_params(**(vectorizer_params or {}))
+        train_vectors = vectorizer.fit_transform(_take(self.documents, train_idx))
+        val_vectors = vectorizer.transform(_take(self.documents, val_idx))
+        return train_vectors, train_labels, val_vectors, val_labels
+
+
+def _fit_and_score(estimator, params, train_vectors, train_labels, val_vectors, val_labels, n_resources):
+    """
+        Fits a clone of 'estimator' with 'params' on the first 'n_resources' training rows
+        Returns the macro f1 score on the validation rows along with the fit and predict times
+    """
+    clf = clone(estimator).set_params(**params)
+    if n_resources < train_vectors.shape[0]:
+        train_vectors = train_vectors[:n_resources]
+        train_labels = train_labels[:n_resources]
+
+    start = time.perf_counter()
+    clf.fit(train_vectors, train_labels)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predicted = clf.predict(val_vectors)
+    predict_time = time.perf_counter() - start
+
+    score = f1_score(val_labels, predicted, average='macro')
+    return score, fit_time, predict_time, val_vectors.shape[0]
+
+
+class ModelSearch:
+
+    """
+        Parallel hyperparameter search over an estimator and (optionally) its vectorizer
+        strategy = 'grid' evaluates every candidate on all the training rows
+        strategy = 'halving' runs successive halving : every round evaluates the surviving
+        candidates on 'factor' times more training rows and keeps the best 1 / 'factor' of them
+        Each candidate is scored with macro f1 and timed on fit / predict so that the
+        leaderboard can be filtered against a latency budget
+        Times measured during the parallel search are inflated by the candidates running
+        on the other cores ('contended'), so the best 'n_timed' candidates are timed again
+        one at a time ('serial') once the search is over
+    """
+
+    def __init__(self, name, estimator, param_grid, fold_cache, vectorizer_grid=None,
+                 strategy='grid', factor=3, min_resources=500, n_jobs=-1, n_timed=10, random_state=0):
+        if strategy not in ('grid', 'halving'):
+            raise ValueError("Unknown search strategy '{}'".format(strategy))
+        self.name = name
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.fold_cache = fold_cache
+        self.vectorizer_grid = list(ParameterGrid(vectorizer_grid or {}))
+        self.strategy = strategy
+        self.factor = factor
+        self.min_resources = min_resources
+        self.n_jobs = n_jobs
+        self.n_timed = n_timed
+        self.random_state = random_state
+        self.results = []
+
+    def _candidates(self):
+        return [(vect_params, clf_params) for vect_params in self.vectorizer_grid
+                for clf_params in ParameterGrid(self.param_grid)]
+
+    def _shuffled_folds(self):
+        """
+            Cached folds with their training rows shuffled once, so that successive halving
+            rounds use nested subsets of the same rows
+        """
+        rng = np.random.RandomState(self.random_state)
+        folds = {}
+        for vect_params in self.vectorizer_grid:
+            for fold in range(len(self.fold_cache.folds)):
+                train_vectors, train_labels, val_vectors, val_labels = \
+                    self.fold_cache.vectorize(fold, vect_params)
+                order = rng.permutation(train_vectors.shape[0])
+                folds[(fold, _params_key(vect_params))] = (
+                    _take(train_vectors, order), train_labels[order], val_vectors, val_labels)
+        return folds
+
+    def _evaluate(self, candidates, folds, n_resources, round_idx):
+        n_folds = len(self.fold_cache.folds)
+        jobs = []
+        for vect_params, clf_params in candidates:
+            for fold in range(n_folds):
+                jobs.append(delayed(_fit_and_score)(
+                    self.estimator, clf_params, *folds[(fold, _params_key(vect_params))], n_resources))
+        scores = Parallel(n_jobs=self.n_jobs)(jobs)
+
+        results = []
+        for pos, (vect_params, clf_params) in enumerate(candidates):
+            fold_scores = scores[pos * n_folds:(pos + 1) * n_folds]
+            f1 = np.array([item[0] for item in fold_scores])
+            fit_time = np.mean([item[1] for item in fold_scores])
+            predict_time = np.mean([item[2] for item in fold_scores])
+            n_predicted = np.mean([item[3] for item in fold_scores])
+            params = dict(vect_params)
+            params.update(clf_params)
+            results.append({
+                "model": self.name,
+                "params": params,
+                "mean_f1": f1.mean(),
+                "std_f1": f1.std(),
+                "fit_time": fit_time,
+                "predict_time": predict_time,
+                "predict_ms_per_tweet": 1000 * predict_time / n_predicted,
+                "timing": "contended",
+                "n_resources": n_resources,
+                "round": round_idx,
+                "candidate": (vect_params, clf_params)
+            })
+        return results
+
+    def fit(self):
+        """
+            Runs the search and returns the leaderboard, sorted by macro f1
+        """
+        self.fold_cache.prefetch(self.vectorizer_grid, n_jobs=self.n_jobs)
+        folds = self._shuffled_folds()
+        max_resources = min(item[0].shape[0] for item in folds.values())
+        candidates = self._candidates()
+
+        if self.strategy == 'grid':
+            self.results = self._evaluate(candidates, folds, max_resources, 0)
+            return self._time_serially(folds)
+
+        n_rounds = 1 + int(math.floor(math.log(len(candidates), self.factor))) if len(candidates) > 1 else 1
+        n_resources = max(self.min_resources, max_resources // self.factor ** (n_rounds - 1))
+        self.results = []
+        for round_idx in range(n_rounds):
+            n_resources = min(n_resources, max_resources)
+            if round_idx == n_rounds - 1:
+                n_resources = max_resources
+            round_results = self._evaluate(candidates, folds, n_resources, round_idx)
+            self.results.extend(round_results)
+
+            n_keep = max(1, int(math.ceil(len(candidates) / self.factor)))
+            round_results.sort(key=lambda item: item["mean_f1"], reverse=True)
+            candidates = [item["candidate"] for item in round_results[:n_keep]]
+            n_resources *= self.factor
+
+        return self._time_serially(folds)
+
+    def _time_serially(self, folds):
+        """
+            Re-times fit / predict of the best 'n_timed' leaderboard entries with nothing
+            else running, so that their times can be checked against a latency budget
+        """
+        leaderboard = self.leaderboard()
+        for result in fully_evaluated(leaderboard)[:self.n_timed]:
+            vect_params, clf_params = result["candidate"]
+            timings = [
+                _fit_and_score(self.estimator, clf_params, *folds[(fold, _params_key(vect_params))],
+                               result["n_resources"])
+                for fold in range(len(self.fold_cache.folds))
+            ]
+            result["fit_time"] = np.mean([item[1] for item in timings])
+            result["predict_time"] = np.mean([item[2] for item in timings])
+            result["predict_ms_per_tweet"] = 1000 * result["predict_time"] / np.mean([item[3] for item in timings])
+            result["timing"] = "serial"
+        return leaderboard
+
+    def leaderboard(self):
+        """
+            Last evaluation of every candidate, best macro f1 first
+        """
+        latest = {}
+        for result in self.results:
+            key = (_params_key(result["candidate"][0]), _params_key(result["candidate"][1]))
+            if key not in latest or result["round"] >= latest[key]["round"]:
+                latest[key] = result
+        # Candidates which reached the last round (evaluated on most rows) rank first
+        return sorted(latest.values(), key=lambda item: (item["round"], item["mean_f1"]), reverse=True)
+
+
+def fully_evaluated(leaderboard):
+    """
+        Leaderboard entries evaluated on all the training rows
+        Candidates eliminated early by successive halving were scored / timed on a subset of the
+        rows, their model on all the rows scores and times differently
+    """
+    if not leaderboard:
+        return []
+    max_resources = max(result["n_resources"] for result in leaderboard)
+    return [result for result in leaderboard if result["n_resources"] == max_resources]
+
+
+def select_within_budget(leaderboard, max_latency_ms=None, max_fit_time=None):
+    """
+        Returns the best scoring fully evaluated leaderboard entry whose per tweet predict latency
+        (in ms) and fit time (in seconds) are within the given budget, or None if no entry fits
+        'contended' times are upper bounds, so a contended entry within budget is within it serially too
+    """
+    for result in fully_evaluated(leaderboard):
+        if within_budget(result, max_latency_ms, max_fit_time):
+            return result
+    return None
+
+
+def within_budget(result, max_latency_ms=None, max_fit_time=None):
+    """
+        Checks whether a leaderboard entry satisfies the latency / fit time budget
+    """
+    if max_latency_ms is not None and result["predict_ms_per_tweet"] > max_latency_ms:
+        return False
+    if max_fit_time is not None and result["fit_time"] > max_fit_time:
+        return False
+    return True
+
+
+def write_leaderboard(file_path, leaderboard, max_latency_ms=None, max_fit_time=None):
+    """
+        Writes the 'leaderboard' as a csv file, with one row per candidate
+        Only fully evaluated entries can be within budget
+    """
+    full = set(id(result) for result in fully_evaluated(leaderboard))
+    with open(file_path, "w", encoding="utf-8", newline="") as outFile:
+        writer = csv.DictWriter(outFile, fieldnames=LEADERBOARD_FIELDS)
+        writer.writeheader()
+        for rank, result in enumerate(leaderboard, start=1):
+            writer.writerow(
+                {
+                    "rank": rank,
+                    "model": result["model"],
+                    "params": format_params(result["params"]),
+                    "mean_f1": round(result["mean_f1"], 6),
+                    "std_f1": round(result["std_f1"], 6),
+                    "fit_time": round(result["fit_time"], 6),
+                    "predict_time": round(result["predict_time"], 6),
+                    "predict_ms_per_tweet": round(result["predict_ms_per_tweet"], 6),
+                    "timing": result["timing"],
+                    "n_resources": result["n_resources"],
+                    "within_budget": id(result) in full and within_budget(result, max_latency_ms, max_fit_time)
+                }
+            )
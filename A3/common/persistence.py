@@ -0,0 +1,74 @@
+import os
+import glob
+import joblib
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+from .text import preprocess_all
+
+MODEL_EXTENSION = ".joblib"
+
+
+class SpacyVectorizer(BaseEstimator, TransformerMixin):
+
+    """
+        Word2Vec (spacy) document vectors as a pipeline step
+        The language model is loaded lazily and is not pickled with the pipeline
+    """
+
+    def __init__(self, model_name='en_core_web_md'):
+        self.model_name = model_name
+
+    @property
+    def langModel(self):
+        if getattr(self, "_langModel", None) is None:
+            import spacy
+            self._langModel = spacy.load(self.model_name)
+        return self._langModel
+
+    def fit(self, tweets, labels=None):
+        return self
+
+    def transform(self, tweets):
+        return np.array([self.langModel(tweet).vector for tweet in tweets])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_langModel", None)
+        return state
+
+
+def make_pipeline(*steps):
+    """
+        Builds a pipeline out of already fitted (name, step) pairs
+        The tweets are preprocessed by the first step, so the pipeline scores raw tweets
+    """
+    return Pipeline([("preprocess", FunctionTransformer(preprocess_all))] + list(steps))
+
+
+def save_pipeline(pipeline, name, model_dir):
+    """
+        Serializes the fitted 'pipeline' to '<model_dir>/<name>.joblib'
+    """
+    if not os.path.exists(model_dir):
+        os.makedirs(model_dir)
+    file_path = os.path.join(model_dir, name + MODEL_EXTENSION)
+    joblib.dump(pipeline, file_path)
+    return file_path
+
+
+def load_pipeline(file_path):
+    return joblib.load(file_path)
+
+
+def load_pipelines(model_dir):
+    """
+        Loads every pipeline stored in 'model_dir', keyed by its name
+    """
+    pipelines = dict()
+    for file_path in sorted(glob.glob(os.path.join(model_dir, "*" + MODEL_EXTENSION))):
+        name = os.path.basename(file_path)[:-len(MODEL_EXTENSION)]
+        pipelines[name] = load_pipeline(file_path)
+    return pipelines
@@ -0,0 +1,238 @@
+import json
+import time
+import asyncio
+from collections import deque
+from urllib.parse import urlsplit
+import numpy as np
+
+# Number of most recent request latencies kept for the percentiles
+LATENCY_WINDOW = 10000
+# Throughput is measured over the requests completed in the last THROUGHPUT_WINDOW seconds
+THROUGHPUT_WINDOW = 10.0
+
+HTTP_STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error"
+}
+
+
+class ServiceStats:
+
+    """
+        Latency and throughput counters of the inference service
+        Request / tweet rates cover the requests completed in the last THROUGHPUT_WINDOW
+        seconds, so that the idle time before a load test does not dilute them
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.tweets = 0
+        self.batches = 0
+        self.batched_tweets = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        # (completion time, number of tweets) of the requests within the throughput window
+        self.completed = deque()
+
+    def record_request(self, n_tweets, latency):
+        self.requests += 1
+        self.tweets += n_tweets
+        self.latencies.append(latency)
+        now = time.perf_counter()
+        self.completed.append((now, n_tweets))
+        self._expire(now)
+
+    def _expire(self, now):
+        while self.completed and self.completed[0][0] < now - THROUGHPUT_WINDOW:
+            self.completed.popleft()
+
+    def record_batch(self, n_tweets):
+        self.batches += 1
+        self.batched_tweets += n_tweets
+
+    def snapshot(self):
+        now = time.perf_counter()
+        elapsed = now - self.started
+        self._expire(now)
+        window = min(elapsed, THROUGHPUT_WINDOW)
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "tweets": self.tweets,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_tweets / self.batches if self.batches else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "requests_per_sec": len(self.completed) / window,
+            "tweets_per_sec": sum(n_tweets for _, n_tweets in self.completed) / window,
+            "throughput_window_sec": window,
+            "uptime_sec": elapsed
+        }
+
+
+class MicroBatcher:
+
+    """
+        Groups concurrent predict requests for one model into a single 'predict' call
+        A batch is flushed once it holds 'max_batch_size' tweets or once its first
+        request has waited 'max_wait_ms', whichever happens first
+        The model runs in the default executor so that the event loop keeps accepting requests
+    """
+
+    def __init__(self, model, stats, max_batch_size=256, max_wait_ms=5.0):
+        self.model = model
+        self.stats = stats
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.worker = None
+
+    def start(self):
+        # The queue is created here so that it belongs to the running event loop
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.ensure_future(self.run())
+
+    async def predict(self, tweets):
+        future = asyncio.get_event_loop().create_future()
+        await self.queue.put((tweets, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_event_loop()
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = await self._collect()
+            try:
+                tweets = [tweet for request, _ in batch for tweet in request]
+                labels = await loop.run_in_executor(None, self.model.predict, tweets)
+                labels = [int(label) for label in labels]
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                # Only this batch fails, the worker keeps serving the next requests
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.stats.record_batch(len(tweets))
+
+            start = 0
+            for request, future in batch:
+                if not future.done():
+                    future.set_result(labels[start:start + len(request)])
+                start += len(request)
+
+
+class InferenceService:
+
+    """
+        Minimal asyncio HTTP/1.1 service scoring tweets with the persisted pipelines
+        Endpoints :
+            POST /predict/<model>  body {"tweets": [...]}  ->  {"labels": [...]}
+            GET  /models           names of the loaded pipelines
+            GET  /stats            p50 / p99 latency and throughput counters
+    """
+
+    def __init__(self, pipelines, max_batch_size=256, max_wait_ms=5.0):
+        self.stats = ServiceStats()
+        self.batchers = {
+            name: MicroBatcher(pipeline, self.stats, max_batch_size, max_wait_ms)
+            for name, pipeline in pipelines.items()
+        }
+
+    async def start(self, host="127.0.0.1", port=8000):
+        for batcher in self.batchers.values():
+            batcher.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def stop(self):
+        """
+            Cancels the micro-batching workers, so that the event loop can be closed
+        """
+        workers = [batcher.worker for batcher in self.batchers.values() if batcher.worker is not None]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self.route(method, urlsplit(target).path, body)
+                content = json.dumps(payload).encode("utf-8")
+                writer.write("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\n"
+                             "Content-Length: {}\r\n\r\n".format(status, HTTP_STATUS[status], len(content))
+                             .encode("latin-1") + content)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if path == "/stats":
+            return 200, self.stats.snapshot()
+        if path == "/models":
+            return 200, {"models": sorted(self.batchers.keys())}
+        if not path.startswith("/predict/"):
+            return 404, {"error": "unknown path '{}'".format(path)}
+        if method != "POST":
+            return 405, {"error": "use POST to predict"}
+
+        name = path[len("/predict/"):]
+        if name not in self.batchers:
+            return 404, {"error": "unknown model '{}'".format(name)}
+        try:
+            tweets = json.loads(body.decode("utf-8"))["tweets"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": 'expected a json body {"tweets": [...]}'}
+        if not isinstance(tweets, list) or not tweets:
+            return 400, {"error": "'tweets' must be a non empty list"}
+        if not all(isinstance(tweet, str) for tweet in tweets):
+            return 400, {"error": "every tweet must be a string"}
+
+        start = time.perf_counter()
+        try:
+            # fastText scores one tweet per line
+            labels = await self.batchers[name].predict([tweet.replace("\n", " ") for tweet in tweets])
+        except Exception as error:
+            self.stats.errors += 1
+            return 500, {"error": str(error)}
+        self.stats.record_request(len(tweets), time.perf_counter() - start)
+        return 200, {"model": name, "labels": labels}
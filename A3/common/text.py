@@ -0,0 +1,28 @@
+from string import punctuation
+
+# Maps every punctuation character to a space
+PUNCTUATION_TABLE = str.maketrans(punctuation, " " * len(punctuation))
+
+
+def preprocess(data):
+    """
+        Removes punctuations from the tweets
+    """
+    data = data.translate(PUNCTUATION_TABLE)
+    data = data.replace("  ", " ").lower().strip()
+    return data
+
+
+def preprocess_all(tweets):
+    """
+        Applies 'preprocess' to every tweet in 'tweets'
+        Used as the first step of the persisted pipelines, so they can score raw tweets
+    """
+    return [preprocess(tweet) for tweet in tweets]
+
+
+def normalize(tweets):
+    """
+        Vectorized 'preprocess' over a pandas Series of tweets
+    """
+    return tweets.str.translate(PUNCTUATION_TABLE).str.replace("  ", " ", regex=False).str.lower().str.strip()
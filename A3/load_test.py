@@ -0,0 +1,105 @@
+import csv
+import json
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+
+TEST_PATH = "data/test.tsv"
+
+
+def load_tweets(data_path):
+    """
+        Raw (unprocessed) tweets of the .tsv file pointed out by 'data_path'
+    """
+    with open(data_path, "r", encoding="utf-8") as data_file:
+        data = csv.reader(data_file, delimiter="\t", quotechar=None)
+        next(data)
+        return [line[1] for line in data]
+
+
+async def request(reader, writer, host, method, path, payload=None):
+    """
+        Sends one HTTP/1.1 request over a kept alive connection and returns the decoded json response
+    """
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write("{} {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\n"
+                 "Content-Length: {}\r\n\r\n".format(method, path, host, len(body)).encode("latin-1") + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value)
+    response = json.loads((await reader.readexactly(length)).decode("utf-8"))
+    if status != 200:
+        raise RuntimeError("HTTP {}: {}".format(status, response.get("error")))
+    return response
+
+
+async def client(args, tweets, queue, latencies):
+    """
+        One simulated client, sending requests until the shared 'queue' of work is empty
+    """
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    rng = random.Random()
+    try:
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            batch = rng.sample(tweets, args.tweets_per_request)
+            start = time.perf_counter()
+            await request(reader, writer, args.host, "POST", "/predict/" + args.model, {"tweets": batch})
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def load_test(args):
+    tweets = load_tweets(args.data)
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(None)
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(args, tweets, queue, latencies) for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    print('Model {}: {} requests x {} tweets with {} concurrent clients'.format(
+        args.model, len(latencies), args.tweets_per_request, args.concurrency))
+    print('Client p50 {:.2f} ms, p99 {:.2f} ms, {:.1f} requests / sec, {:.1f} tweets / sec'.format(
+        np.percentile(latencies, 50), np.percentile(latencies, 99),
+        len(latencies) / elapsed, len(latencies) * args.tweets_per_request / elapsed))
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    stats = await request(reader, writer, args.host, "GET", "/stats")
+    writer.close()
+    print('Server {}'.format(json.dumps(stats, indent=4)))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Load test for the local inference service')
+    parser.add_argument('--model', default='RF', help='Name of the served model')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--data', default=TEST_PATH, help='.tsv file the request tweets are sampled from')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--tweets-per-request', type=int, default=1)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(load_test(args))
+    loop.close()
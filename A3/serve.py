@@ -0,0 +1,47 @@
+import os
+import asyncio
+import argparse
+
+from common.persistence import load_pipelines
+from common.serving import InferenceService
+
+MODEL_PATH = "models"
+
+
+def serve(args):
+    pipelines = load_pipelines(args.models)
+    if not pipelines:
+        raise SystemExit("No models found in '{}', run task1 / task2 with --save-models first".format(args.models))
+
+    # Explicit loop handling (rather than asyncio.run / serve_forever) keeps Python 3.6 support
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    service = InferenceService(pipelines, args.max_batch_size, args.max_wait_ms)
+    server = loop.run_until_complete(service.start(args.host, args.port))
+    print('Serving {} on http://{}:{}'.format(", ".join(sorted(pipelines)), args.host, args.port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.run_until_complete(service.stop())
+        loop.close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Local inference service for the persisted classifiers')
+    parser.add_argument('--models', default=MODEL_PATH, help='Directory containing the persisted pipelines')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=256,
+                        help='Maximum number of tweets scored in one micro-batch')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='Maximum time a request waits for its micro-batch to fill up')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.models):
+        raise SystemExit("Model directory '{}' does not exist".format(args.models))
+    serve(args)
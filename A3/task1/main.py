@@ -1,19 +1,28 @@
 import os
+import sys
 import csv
-import pandas as pd
+import argparse
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import cross_validate
 from sklearn.svm import SVC
-from string import punctuation
-from copy import deepcopy
 import spacy
-import fasttext
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.loader import load_data
+from common.forest import CompactForest, oob_f1
+from common.kernel_svm import SVM_BACKENDS, benchmark_svm_backends, make_svm, write_benchmark
+from common.persistence import SpacyVectorizer, make_pipeline, save_pipeline
+from common.fasttext_model import FastTextClassifier
+from common.model_selection import FoldCache, ModelSearch, format_params, select_within_budget, write_leaderboard
 
 TRAIN_PATH = os.path.join("..", os.path.join("data", "train.tsv"))
 TEST_PATH = os.path.join("..", os.path.join("data", "test.tsv"))
 RESULT_PATH = os.path.join("..", 'predictions')
+# Parsed, normalized datasets cached by 'load_data' (keyed by the checksum of the .tsv)
+CACHE_PATH = os.path.join("..", 'cache')
+MODEL_PATH = os.path.join("..", 'models')
 
 # Lists which are populated with the test / train tweets and labels
 
@@ -26,50 +35,48 @@ test_id = []
 all_tweets = []
 
 DEBUG = False
-
-
-def preprocess(data):
-    """
-        Removes punctuations from the tweets
-    """
-    for token in punctuation:
-        data = data.replace(token, " ")
-    data = data.replace("  ", " ").lower().strip()
-    return data
+# Serialize the fitted vectorizer + classifier pipelines to 'MODEL_PATH'
+SAVE_MODELS = False
+# Random Forest size (None grows the trees fully), training / prediction cores and whether
+# the fitted forest is also exported to the compact array representation ('models/RF.npz')
+RF_TREES = 100
+RF_MAX_DEPTH = None
+RF_MIN_SAMPLES_LEAF = 1
+RF_JOBS = -1
+RF_COMPACT = False
+# 'exact' RBF SVC, or its 'rff' (random Fourier features) / 'nystroem' approximation
+SVM_BACKEND = 'exact'
+# fastText training threads (None uses all the cores), autotune seconds (0 disables it)
+# and whether the trained model is quantized
+FT_THREADS = None
+FT_AUTOTUNE = 0
+FT_QUANTIZE = False
+
+# Hyperparameter grids explored by 'ModelSelection'
+# 'vectorizer' grids are applied to the (per fold cached) tf-idf vectorizer
+RF_VECTORIZER_GRID = {"min_df": [2, 5], "max_df": [0.8]}
+RF_PARAM_GRID = {
+    "n_estimators": [100, 300],
+    "max_depth": [None, 50],
+    "min_samples_leaf": [1, 2],
+    "max_features": ["sqrt", 0.05]
+}
+SVM_PARAM_GRID = {
+    "C": [0.1, 1, 10],
+    "gamma": ["scale", 0.01, 0.1]
+}
 
 
 def get_cross_validation_score(clf, train_vectors, train_labels, cv=3, scoring='f1_macro'):
     """
         3 Fold Cross validation with macro f1 score as metric
         Used to observe accuracy of classifier when training
+        The folds are fit in parallel on all the available cores
     """
-    cv_results = cross_validate(clf, train_vectors, train_labels, cv=cv, scoring='f1_macro')
+    cv_results = cross_validate(clf, train_vectors, train_labels, cv=cv, scoring=scoring, n_jobs=-1)
     return (sum(cv_results['test_score']) / len(cv_results['test_score']))
 
 
-def load_data(data_path):
-    """
-        Loads the .tsv file pointed out by 'data_path'
-        Returns the id, tweets and labels (if any) in the file
-    """
-    data_file = open(data_path, "r", encoding="utf-8")
-    data = csv.reader(data_file, delimiter="\t", quotechar=None)
-    header = True
-    ids = []
-    tweets = []
-    labels = []
-    for line in data:
-        if not header:
-            ids.append(line[0])
-            tweets.append(preprocess(line[1]))
-            try:
-                labels.append(line[2])
-            except IndexError:
-                pass
-        header = False
-    return ids, tweets, labels
-
-
 def write_results(file_name, test_labels):
     """
         Writes the predicted 'test_labels' to the output file 'file_name'
@@ -92,53 +99,81 @@ def RandomForest():
 
     """
         Runs the RandomForest Classifier with tf_idf embedding
+        Trees are trained in parallel ('RF_JOBS') on float32 CSC vectors, optionally limited
+        in depth / leaf size, and the out of bag score replaces the cross validation pass
+        With 'RF_COMPACT' the forest is also saved as its compact array export, the predictions
+        still come from the (faster) sklearn trees
     """
 
     if DEBUG:
         print('Running Random Forest')
 
-    vectorizer = TfidfVectorizer(min_df=5, max_df=0.8)
+    # float32 is the dtype the trees split on, so the vectors are not converted again
+    vectorizer = TfidfVectorizer(min_df=5, max_df=0.8, dtype=np.float32)
     # Obtain the sparse matrix containing the tf-idf vectors
     tf_idf_vectors = vectorizer.fit_transform(all_tweets)
 
-    train_vectors = tf_idf_vectors[:len(train_tweets)]
+    # Trees are fit on column (CSC) and predicted on row (CSR) sparse matrices
+    train_vectors = tf_idf_vectors[:len(train_tweets)].tocsc()
     test_vectors = tf_idf_vectors[len(train_tweets):]
 
-    randomForestClf = RandomForestClassifier(random_state=0)
-    if DEBUG:
-        print(get_cross_validation_score(randomForestClf, train_vectors, train_labels))
+    randomForestClf = RandomForestClassifier(n_estimators=RF_TREES, max_depth=RF_MAX_DEPTH,
+                                             min_samples_leaf=RF_MIN_SAMPLES_LEAF, oob_score=DEBUG,
+                                             n_jobs=RF_JOBS, random_state=0)
     randomForestClf.fit(train_vectors, np.array(train_labels))
+    if DEBUG:
+        print('Out of bag macro f1: {}'.format(oob_f1(randomForestClf, train_labels)))
+
     test_labels = randomForestClf.predict(test_vectors)
 
     write_results("RF.csv", test_labels)
 
+    if RF_COMPACT:
+        if not os.path.exists(MODEL_PATH):
+            os.makedirs(MODEL_PATH)
+        CompactForest.from_forest(randomForestClf).save(os.path.join(MODEL_PATH, "RF.npz"))
 
-def SVMClassifier():
+    if SAVE_MODELS:
+        save_pipeline(make_pipeline(("tfidf", vectorizer), ("rf", randomForestClf)), "RF", MODEL_PATH)
+
+
+def get_embeddings(tweets):
 
     """
-        Runs the SVM Classifier with Word2Vec Embeddings
+        Returns the Word2Vec (spacy) document vectors of 'tweets'
     """
 
-    if DEBUG:
-        print('Running SVM')
-
     # Spacy English Language model
     langModel = spacy.load('en_core_web_md')
 
     corpus = []
     counter = 0
-    for tweet in all_tweets:
+    for tweet in tweets:
         tokens = langModel(tweet)
         embeddings = tokens.vector
         corpus.append(embeddings)
         counter += 1
         if DEBUG and counter % 100 == 0:
             print('Embeddings calculated for {} tweets'.format(counter))
+    return corpus
+
+
+def SVMClassifier():
+
+    """
+        Runs the SVM Classifier with Word2Vec Embeddings
+        The kernel is exact or approximated depending on 'SVM_BACKEND'
+    """
+
+    if DEBUG:
+        print('Running SVM ({})'.format(SVM_BACKEND))
+
+    corpus = get_embeddings(all_tweets)
 
     train_vectors = corpus[:len(train_tweets)]
     test_vectors = corpus[len(train_tweets):]
 
-    SVMclf = SVC(random_state=0)
+    SVMclf = make_svm(SVM_BACKEND, random_state=0)
     if DEBUG:
         print(get_cross_validation_score(SVMclf, train_vectors, train_labels))
     SVMclf.fit(train_vectors, np.array(train_labels))
@@ -146,57 +181,141 @@ def SVMClassifier():
 
     write_results("SVM.csv", test_labels)
 
+    if SAVE_MODELS:
+        save_pipeline(make_pipeline(("embed", SpacyVectorizer()), ("svm", SVMclf)), "SVM", MODEL_PATH)
+
 
-def prepare_train_file():
+def FastText():
 
     """
-        Generates the train file required by 'FastText' containing labels prefixed with __label__
+        Runs the Supervised FastText classifier
+        Trains from an in-memory file with 'FT_THREADS' threads, optionally autotuned for
+        'FT_AUTOTUNE' seconds and quantized ('FT_QUANTIZE') into a smaller, faster model
     """
 
-    outFile = open('data.train.txt', 'w', encoding='utf-8')
-    for idx in range(len(train_tweets)):
-        outFile.write('__label__{} {}\n'.format(
-            train_labels[idx], train_tweets[idx]))
-    outFile.close()
+    if DEBUG:
+        print('Running Fasttext')
 
+    fastTextClf = FastTextClassifier(thread=FT_THREADS, autotune_duration=FT_AUTOTUNE, quantize=FT_QUANTIZE)
+    fastTextClf.fit(train_tweets, train_labels)
+    test_labels = fastTextClf.predict(test_tweets)
 
-def FastText():
+    write_results("FT.csv", test_labels)
+
+    if SAVE_MODELS:
+        save_pipeline(make_pipeline(("fasttext", fastTextClf)), "FT", MODEL_PATH)
+
+
+def BenchmarkSVM():
 
     """
-        Runs the Supervised FastText classifier
+        Compares the exact SVC with its kernel approximations on a held out part of the train set
+        The accuracy, macro f1, fit and predict times are stored in 'predictions/svm_benchmark.csv'
     """
 
     if DEBUG:
-        print('Running Fasttext')
+        print('Running SVM Benchmark')
 
-    # Generate the specific train file required by fasttext
-    prepare_train_file()
+    results = benchmark_svm_backends(get_embeddings(train_tweets), train_labels)
+    write_benchmark(os.path.join(RESULT_PATH, "svm_benchmark.csv"), results)
+    for result in results:
+        print('{backend}: accuracy {accuracy:.4f}, macro f1 {macro_f1:.4f}, '
+              'fit {fit_time:.2f}s, predict {predict_time:.2f}s'.format(**result))
 
-    model = fasttext.train_supervised('data.train.txt')
-    results = model.predict(test_tweets)
 
-    for idx in range(len(test_tweets)):
-        label = results[0][idx][0]
-        if label == '__label__0':
-            label = '0'
-        else:
-            label = '1'
-        test_labels.append(label)
+def run_search(name, search, max_latency_ms=None):
 
-    write_results("FT.csv", test_labels)
+    """
+        Runs the hyperparameter 'search' and writes its leaderboard to 'leaderboard_<name>.csv'
+        Prints the best configuration which satisfies the latency budget
+    """
+
+    leaderboard = search.fit()
+    write_leaderboard(os.path.join(RESULT_PATH, "leaderboard_{}.csv".format(name)),
+                      leaderboard, max_latency_ms=max_latency_ms)
+
+    best = select_within_budget(leaderboard, max_latency_ms=max_latency_ms)
+    if best is None:
+        print('{}: no configuration within {} ms per tweet'.format(name, max_latency_ms))
+    else:
+        print('{}: macro f1 {:.4f} with {} ({:.4f} ms per tweet)'.format(
+            name, best["mean_f1"], format_params(best["params"]), best["predict_ms_per_tweet"]))
+
+
+def ModelSelection(strategy='grid', n_jobs=-1, max_latency_ms=None):
+
+    """
+        Parallel hyperparameter search for the Random Forest and SVM classifiers
+        Writes a leaderboard of macro f1 vs fit / predict time for each of them
+    """
+
+    if DEBUG:
+        print('Running Model Selection')
+
+    rfFolds = FoldCache(train_tweets, train_labels, vectorizer=TfidfVectorizer())
+    rfSearch = ModelSearch("RF", RandomForestClassifier(random_state=0), RF_PARAM_GRID, rfFolds,
+                           vectorizer_grid=RF_VECTORIZER_GRID, strategy=strategy, n_jobs=n_jobs)
+    run_search("RF", rfSearch, max_latency_ms)
+
+    # Embeddings do not depend on the fold, compute them once for all the folds
+    svmFolds = FoldCache(np.array(get_embeddings(train_tweets)), train_labels)
+    svmSearch = ModelSearch("SVM", SVC(random_state=0), SVM_PARAM_GRID, svmFolds,
+                            strategy=strategy, n_jobs=n_jobs)
+    run_search("SVM", svmSearch, max_latency_ms)
 
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--search', choices=['grid', 'halving'],
+                        help='Run the hyperparameter search instead of the classifiers')
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help='Number of cores used by the hyperparameter search')
+    parser.add_argument('--max-latency-ms', type=float,
+                        help='Per tweet predict latency budget for the hyperparameter search')
+    parser.add_argument('--rf-max-depth', type=int, help='Maximum depth of the Random Forest trees')
+    parser.add_argument('--rf-min-samples-leaf', type=int, default=RF_MIN_SAMPLES_LEAF,
+                        help='Minimum number of tweets in a Random Forest leaf')
+    parser.add_argument('--rf-compact', action='store_true',
+                        help="Also save the compact array export of the Random Forest to '{}'".format(
+                            os.path.join(MODEL_PATH, 'RF.npz')))
+    parser.add_argument('--svm-backend', choices=SVM_BACKENDS, default=SVM_BACKEND,
+                        help='Exact RBF SVC or a kernel approximation followed by a linear SVM')
+    parser.add_argument('--benchmark-svm', action='store_true',
+                        help='Compare the SVM backends on accuracy and fit / predict time')
+    parser.add_argument('--ft-threads', type=int, help='Number of fastText training threads')
+    parser.add_argument('--ft-autotune', type=int, default=FT_AUTOTUNE,
+                        help='Seconds of fastText hyperparameter autotuning (0 disables it)')
+    parser.add_argument('--ft-quantize', action='store_true',
+                        help='Quantize the fastText model into a smaller, faster model')
+    parser.add_argument('--save-models', action='store_true',
+                        help="Serialize the fitted pipelines to '{}'".format(MODEL_PATH))
+    args = parser.parse_args()
+    SAVE_MODELS = args.save_models
+    RF_MAX_DEPTH = args.rf_max_depth
+    RF_MIN_SAMPLES_LEAF = args.rf_min_samples_leaf
+    RF_COMPACT = args.rf_compact
+    SVM_BACKEND = args.svm_backend
+    FT_THREADS = args.ft_threads
+    FT_AUTOTUNE = args.ft_autotune
+    FT_QUANTIZE = args.ft_quantize
+
     if not os.path.exists(RESULT_PATH):
         os.makedirs(RESULT_PATH)
 
-    # Read test / train tweets to lists
-    train_id, train_tweets, train_labels = load_data(TRAIN_PATH)
-    test_id, test_tweets, test_labels = load_data(TEST_PATH)
+    # Read test / train tweets to arrays
+    train_id, train_tweets, train_labels = load_data(TRAIN_PATH, str, CACHE_PATH)
+    test_id, test_tweets, test_labels = load_data(TEST_PATH, str, CACHE_PATH)
+
+    all_tweets = np.concatenate([train_tweets, test_tweets])
+
+    if args.search:
+        ModelSelection(args.search, args.n_jobs, args.max_latency_ms)
+        sys.exit(0)
 
-    all_tweets = deepcopy(train_tweets)
-    all_tweets.extend(test_tweets)
+    if args.benchmark_svm:
+        BenchmarkSVM()
+        sys.exit(0)
 
     RandomForest()
     SVMClassifier()
@@ -1,20 +1,32 @@
 import os
+import sys
 import csv
+import argparse
 import re
-import pandas as pd
+from functools import partial
 import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.feature_selection import mutual_info_classif, SelectKBest
+from sklearn.feature_selection import SelectKBest
 from sklearn.model_selection import cross_validate
 from sklearn.svm import SVC
-from string import punctuation
-from copy import deepcopy
 from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.text import preprocess
+from common.loader import load_data
+from common.feature_selection import presence_chi2, presence_mutual_info
+from common.persistence import MODEL_EXTENSION, load_pipeline, make_pipeline, save_pipeline
+from common.model_selection import FoldCache, ModelSearch, format_params, select_within_budget, write_leaderboard
+from common.streaming import StreamingClassifier, macro_f1, run_stream
 
 
 TRAIN_PATH = os.path.join("..", os.path.join("data", "train.tsv"))
 TEST_PATH = os.path.join("..", os.path.join("data", "test.tsv"))
 RESULT_PATH = os.path.join("..", 'predictions')
+# Parsed, normalized datasets cached by 'load_data' (keyed by the checksum of the .tsv)
+CACHE_PATH = os.path.join("..", 'cache')
+MODEL_PATH = os.path.join("..", 'models')
 
 # Lists which are populated with the test / train tweets and labels
 
@@ -26,50 +38,31 @@ train_id = []
 test_id = []
 
 DEBUG = False
+# Serialize the fitted vectorizer + classifier pipeline to 'MODEL_PATH'
+SAVE_MODELS = False
+# Cores used to score the features, vocabularies over 'feature_selection.CHUNK_SIZE' terms are scored in parallel chunks
+N_JOBS = -1
 
-
-def preprocess(data):
-    """
-        Removes punctuations from the tweets
-    """
-    for token in punctuation:
-        data = data.replace(token, " ")
-    data = data.replace("  ", " ").lower().strip()
-    return data
+# Hyperparameter grids explored by 'ModelSelection'
+# 'vectorizer' grids are applied to the (per fold cached) count vectorizer
+NB_VECTORIZER_GRID = {"min_df": [2, 5], "max_df": [0.9]}
+NB_PARAM_GRID = {
+    "select__score_func": [presence_mutual_info, presence_chi2],
+    "select__k": [1000, 2000, "all"],
+    "nb__alpha": [0.1, 0.5, 1.0]
+}
 
 
 def get_cross_validation_score(clf, train_vectors, train_labels, cv=3, scoring='f1_macro'):
     """
         3 Fold Cross validation with macro f1 score as metric
         Used to observe accuracy of classifier when training
+        The folds are fit in parallel on all the available cores
     """
-    cv_results = cross_validate(clf, train_vectors, train_labels, cv=cv, scoring='f1_macro')
+    cv_results = cross_validate(clf, train_vectors, train_labels, cv=cv, scoring=scoring, n_jobs=-1)
     return (sum(cv_results['test_score']) / len(cv_results['test_score']))
 
 
-def load_data(data_path):
-    """
-        Loads the .tsv file pointed out by 'data_path'
-        Returns the id, tweets and labels (if any) in the file
-    """
-    data_file = open(data_path, "r", encoding="utf-8")
-    data = csv.reader(data_file, delimiter="\t", quotechar=None)
-    header = True
-    ids = []
-    tweets = []
-    labels = []
-    for line in data:
-        if not header:
-            ids.append(line[0])
-            tweets.append(preprocess(line[1]))
-            try:
-                labels.append(int(line[2]))
-            except IndexError:
-                pass
-        header = False
-    return ids, tweets, labels
-
-
 def write_results(file_name, test_labels):
     """
         Writes the predicted 'test_labels' to the output file 'file_name'
@@ -93,6 +86,7 @@ def multinomialNB(train_tweets, test_tweets):
     """
         Runs the Multinomial Naive Bayes Classifier with Feature Selection
         Feature Selection is based on Mutual Information scores
+        The scores are the exact Mutual Information of term presence, computed from the sparse counts
     """
 
     if DEBUG:
@@ -104,7 +98,7 @@ def multinomialNB(train_tweets, test_tweets):
     test_vectors = vectorizer.transform(test_tweets)
 
     # Select the top 2000 features based on Mutual Information score
-    topK = SelectKBest(mutual_info_classif, k=2000)
+    topK = SelectKBest(partial(presence_mutual_info, n_jobs=N_JOBS), k=2000)
     train_vectors = topK.fit_transform(train_vectors, train_labels)
     test_vectors = topK.transform(test_vectors)
 
@@ -117,13 +111,115 @@ def multinomialNB(train_tweets, test_tweets):
 
     write_results("T2.csv", test_labels)
 
+    if SAVE_MODELS:
+        save_pipeline(make_pipeline(("count", vectorizer), ("select", topK), ("nb", randomForestClf)),
+                      "NB", MODEL_PATH)
+
+
+def ModelSelection(strategy='grid', n_jobs=-1, max_latency_ms=None):
+
+    """
+        Parallel hyperparameter search for the Multinomial Naive Bayes Classifier
+        Feature Selection is part of the searched pipeline, so it is refit on every fold
+        Writes a leaderboard of macro f1 vs fit / predict time
+    """
+
+    if DEBUG:
+        print('Running Model Selection')
+
+    nbPipeline = Pipeline([
+        ("select", SelectKBest(presence_mutual_info)),
+        ("nb", MultinomialNB())
+    ])
+    # 'SelectKBest' only passes (X, y) to its score function
+    param_grid = dict(NB_PARAM_GRID, select__score_func=[
+        partial(score_func, n_jobs=n_jobs) for score_func in NB_PARAM_GRID["select__score_func"]])
+    nbFolds = FoldCache(train_tweets, train_labels, vectorizer=CountVectorizer())
+    nbSearch = ModelSearch("NB", nbPipeline, param_grid, nbFolds,
+                           vectorizer_grid=NB_VECTORIZER_GRID, strategy=strategy, n_jobs=n_jobs)
+
+    leaderboard = nbSearch.fit()
+    write_leaderboard(os.path.join(RESULT_PATH, "leaderboard_NB.csv"),
+                      leaderboard, max_latency_ms=max_latency_ms)
+
+    best = select_within_budget(leaderboard, max_latency_ms=max_latency_ms)
+    if best is None:
+        print('NB: no configuration within {} ms per tweet'.format(max_latency_ms))
+    else:
+        print('NB: macro f1 {:.4f} with {} ({:.4f} ms per tweet)'.format(
+            best["mean_f1"], format_params(best["params"]), best["predict_ms_per_tweet"]))
+
+
+def Streaming(source, model='nb', batch_size=1000, resume=False):
+
+    """
+        Trains an online classifier on the tweets read from 'source' ('-' for stdin)
+        Labelled tweets update the model in mini-batches, unlabelled ones are predicted
+        The predictions are stored in 'predictions/T2_stream.csv'
+        The model is saved to 'models/<NB|SGD>_stream.joblib' after the stream ends,
+        with 'resume' training continues from the saved model instead of from scratch
+    """
+
+    if DEBUG:
+        print('Running Streaming {} Classifier'.format(model))
+
+    name = "{}_stream".format(model.upper())
+    model_file = os.path.join(MODEL_PATH, name + MODEL_EXTENSION)
+    if resume and os.path.exists(model_file):
+        streamClf = load_pipeline(model_file).named_steps["stream"]
+        print('Resuming from {} ({} tweets seen)'.format(model_file, streamClf.n_seen))
+    else:
+        streamClf = StreamingClassifier(model)
+    outFile = open(os.path.join(RESULT_PATH, "T2_stream.csv"), "w", encoding='utf-8')
+    if source == '-':
+        confusion = run_stream(sys.stdin, streamClf, preprocess, outFile, batch_size)
+    else:
+        with open(source, "r", encoding="utf-8") as data_file:
+            confusion = run_stream(data_file, streamClf, preprocess, outFile, batch_size)
+    outFile.close()
+
+    print('Trained on {} tweets, prequential macro f1 {:.4f}'.format(
+        streamClf.n_seen, macro_f1(confusion)))
+    if streamClf.n_seen:
+        # Stored as a pipeline, so the model can also be served on raw tweets
+        save_pipeline(make_pipeline(("stream", streamClf)), name, MODEL_PATH)
+
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--search', choices=['grid', 'halving'],
+                        help='Run the hyperparameter search instead of the classifier')
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help='Number of cores used by the hyperparameter search and the feature scoring')
+    parser.add_argument('--max-latency-ms', type=float,
+                        help='Per tweet predict latency budget for the hyperparameter search')
+    parser.add_argument('--stream', metavar='PATH',
+                        help="Train online on the tweets in PATH ('-' for stdin) in mini-batches")
+    parser.add_argument('--stream-model', choices=['nb', 'sgd'], default='nb',
+                        help='Model updated by the streaming mode')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='Number of tweets per mini-batch in the streaming mode')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue training the saved streaming model instead of starting over')
+    parser.add_argument('--save-models', action='store_true',
+                        help="Serialize the fitted pipeline to '{}'".format(MODEL_PATH))
+    args = parser.parse_args()
+    SAVE_MODELS = args.save_models
+    N_JOBS = args.n_jobs
+
     if not os.path.exists(RESULT_PATH):
         os.makedirs(RESULT_PATH)
 
-    train_id, train_tweets, train_labels = load_data(TRAIN_PATH)
-    test_id, test_tweets, test_labels = load_data(TEST_PATH)
+    if args.stream:
+        Streaming(args.stream, args.stream_model, args.batch_size, args.resume)
+        sys.exit(0)
+
+    train_id, train_tweets, train_labels = load_data(TRAIN_PATH, int, CACHE_PATH)
+    test_id, test_tweets, test_labels = load_data(TEST_PATH, int, CACHE_PATH)
+
+    if args.search:
+        ModelSelection(args.search, args.n_jobs, args.max_latency_ms)
+        sys.exit(0)
 
     multinomialNB(train_tweets, test_tweets)